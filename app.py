@@ -1,22 +1,47 @@
 import os
+import re
 import logging
-import time
 import threading
 import signal
 import sys
-import numpy as np
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add project root to path to allow imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import application modules
+# Import application modules (core components are imported lazily on first use)
 from config.config_manager import ConfigManager
-from core.screenshot import ScreenshotCapture
-from core.audio_manager import AudioManager
-from core.ai_connector import AIConnector
-from core.session_manager import SessionManager
-from core.input_manager import InputManager
+
+# Directories the application expects to exist, created once per process
+REQUIRED_DIRECTORIES = ("config", "sessions", "prompts")
+_directories_ensured = False
+
+# Punctuation that ends a speakable chunk when followed by whitespace
+SPEECH_BOUNDARY = re.compile(r"[.!?,](?=\s)")
+
+# Minimum number of words before a comma is treated as a chunk boundary
+MIN_CLAUSE_WORDS = 4
+
+def split_speech_chunk(buffer):
+    """
+    Split streamed text after its last sentence or clause boundary.
+    
+    Args:
+        buffer (str): Text received so far that has not been spoken
+        
+    Returns:
+        tuple: (text ready to speak, remaining text to keep buffering)
+    """
+    cut = 0
+    for match in SPEECH_BOUNDARY.finditer(buffer):
+        end = match.end()
+        if match.group() == "," and len(buffer[cut:end].split()) < MIN_CLAUSE_WORDS:
+            continue
+        cut = end
+    
+    return buffer[:cut].strip(), buffer[cut:]
 
 class AIAssistant:
     """Main AI Assistant application."""
@@ -28,21 +53,18 @@ class AIAssistant:
         # Initialize components
         print("Initializing AI Assistant...")
         self.config_manager = ConfigManager(config_path)
-        self.session_manager = SessionManager(self.config_manager)
-        self.screenshot_capture = ScreenshotCapture(self.config_manager)
-        self.audio_manager = AudioManager(self.config_manager)
-        self.ai_connector = AIConnector(self.config_manager)
-        
-        # Initialize input manager with callbacks
-        self.input_manager = InputManager(
-            self.config_manager,
-            on_press=self._handle_shortcut_press,
-            on_release=self._handle_shortcut_release
-        )
         
         # Internal state
         self.current_screenshot = None
-        self.running = False
+        
+        # Screenshots are captured in the background while the user is speaking
+        self._capture_executor = ThreadPoolExecutor(max_workers=1)
+        self._screenshot_future = None
+        
+        # Older history is summarized off the hot path, one batch at a time
+        self._summary_executor = ThreadPoolExecutor(max_workers=1)
+        self._stop = threading.Event()
+        self._stop.set()
         
         # Set up signal handling for graceful shutdown
         signal.signal(signal.SIGINT, self._handle_signal)
@@ -51,39 +73,102 @@ class AIAssistant:
         # Create logger
         self.logger = logging.getLogger("AIAssistant")
     
+    @cached_property
+    def session_manager(self):
+        """Session manager, created on first use."""
+        from core.session_manager import SessionManager
+        return SessionManager(self.config_manager)
+    
+    @cached_property
+    def screenshot_capture(self):
+        """Screenshot capture, created on first use."""
+        from core.screenshot import ScreenshotCapture
+        return ScreenshotCapture(self.config_manager)
+    
+    @cached_property
+    def audio_manager(self):
+        """Audio manager, created on first use."""
+        from core.audio_manager import AudioManager
+        return AudioManager(self.config_manager)
+    
+    @cached_property
+    def ai_connector(self):
+        """Gemini connector, created on first use."""
+        from core.ai_connector import AIConnector
+        return AIConnector(self.config_manager)
+    
+    @cached_property
+    def input_manager(self):
+        """Input manager wired to the shortcut callbacks, created on first use."""
+        from core.input_manager import InputManager
+        return InputManager(
+            self.config_manager,
+            on_press=self._handle_shortcut_press,
+            on_release=self._handle_shortcut_release
+        )
+    
     def _ensure_directories(self):
         """Ensure all required directories exist."""
-        os.makedirs("config", exist_ok=True)
-        os.makedirs("sessions", exist_ok=True)
-        os.makedirs("prompts", exist_ok=True)
+        global _directories_ensured
+        if _directories_ensured:
+            return
+        
+        for directory in REQUIRED_DIRECTORIES:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+        _directories_ensured = True
+    
+    @property
+    def running(self):
+        """Whether the assistant is running."""
+        return not self._stop.is_set()
     
     def start(self):
         """Start the AI Assistant."""
-        self.running = True
+        self._stop.clear()
         
         # Get shortcut key for user information
         shortcut_key = self.config_manager.get_shortcut_key()
         
+        # Build the heavy components up front so the first press records
+        # immediately (mixer, Groq client, TTS voice, Gemini model and cache)
+        self.session_manager
+        self.screenshot_capture
+        self.audio_manager
+        self.ai_connector
+        
         print(f"AI Assistant started. Press and hold '{shortcut_key}' to activate.")
         print("Press Ctrl+C to exit.")
         
         # Start keyboard listener
         self.input_manager.start_listening()
         
-        # Keep the main thread alive
+        # Block the main thread until shutdown is requested
         try:
-            while self.running:
-                time.sleep(0.1)
+            self._stop.wait()
         except KeyboardInterrupt:
             self._shutdown()
     
     def _shutdown(self):
         """Shut down the AI Assistant."""
-        self.running = False
+        # A second Ctrl+C or signal must not repeat the cleanup
+        if not self.running:
+            return
+        self._stop.set()
         print("\nShutting down AI Assistant...")
         
         # Clean up resources
         self.input_manager.stop_listening()
+        if "audio_manager" in self.__dict__:
+            self.audio_manager.shutdown()
+        if "session_manager" in self.__dict__:
+            self.session_manager.close()
+        if "ai_connector" in self.__dict__:
+            self.ai_connector.close()
+        if "screenshot_capture" in self.__dict__:
+            # Captures run on the executor thread, which owns the mss session
+            self._capture_executor.submit(self.screenshot_capture.close)
+        self._capture_executor.shutdown(wait=False)
+        self._summary_executor.shutdown(wait=False, cancel_futures=True)
         
         print("Goodbye!")
     
@@ -92,12 +177,18 @@ class AIAssistant:
         self.logger.info("Shortcut pressed, starting capture")
         print("Assistant activated. Capturing screenshot...")
         
-        # Capture screenshot
-        self.current_screenshot = self.screenshot_capture.capture_active_window()
+        # Interrupt any answer that is still being spoken
+        if "audio_manager" in self.__dict__:
+            self.audio_manager.stop_speaking()
         
-        # Start audio recording
+        # Start audio recording first so the start of the question isn't lost
         print("Listening... (release shortcut when done speaking)")
         self.audio_manager.start_recording()
+        
+        # Capture screenshot in parallel with recording
+        self._screenshot_future = self._capture_executor.submit(
+            self.screenshot_capture.capture_active_window
+        )
     
     def _handle_shortcut_release(self):
         """Handle shortcut key release events."""
@@ -105,14 +196,21 @@ class AIAssistant:
         print("Processing your question...")
         
         # Stop recording and get audio data
-        audio_data = self.audio_manager.stop_recording()
+        audio_data, nsamples = self.audio_manager.stop_recording()
         
-        if audio_data is None or (isinstance(audio_data, np.ndarray) and audio_data.size == 0):
+        if nsamples == 0:
+            self.audio_manager.discard_recording()
             print("No audio detected. Please try again.")
             return
         
+        # Skip the STT call entirely when nothing was said
+        if self.audio_manager.is_silent(audio_data, nsamples):
+            self.audio_manager.discard_recording()
+            print("No speech detected. Please try again.")
+            return
+        
         # Convert speech to text
-        question = self.audio_manager.transcribe_audio(audio_data)
+        question = self.audio_manager.transcribe_audio(audio_data, nsamples)
         
         if not question:
             print("Could not understand audio. Please try again.")
@@ -121,27 +219,55 @@ class AIAssistant:
         print(f"Your question: \"{question}\"")
         
         # Get conversation history
-        history = self.session_manager.get_conversation_history()
+        history = self.session_manager.get_recent_history()
+        
+        # The screenshot has normally finished long before transcription
+        self.current_screenshot = self._screenshot_future.result() if self._screenshot_future else None
+        self._screenshot_future = None
         
         # Process with Gemini if we have a screenshot
         if self.current_screenshot:
             print("Sending to Gemini API...")
-            answer = self.ai_connector.process_query(
+            
+            # Speak each sentence as soon as it has streamed in
+            answer_parts = []
+            pending = ""
+            for text in self.ai_connector.stream_query(
                 question,
                 self.current_screenshot,
-                history
-            )
+                history,
+                self.session_manager.history_summary
+            ):
+                answer_parts.append(text)
+                speakable, pending = split_speech_chunk(pending + text)
+                self.audio_manager.queue_speech(speakable)
+            self.audio_manager.queue_speech(pending.strip())
             
+            answer = "".join(answer_parts)
             print(f"Answer: \"{answer[:100]}{'...' if len(answer) > 100 else ''}\"")
             
             # Save to markdown
             self.session_manager.add_interaction(question, answer)
             
-            # Speak the answer
-            self.audio_manager.speak_text(answer)
+            # Condense turns that just left the history window for later queries
+            dropped = self.session_manager.take_dropped_turns()
+            if dropped:
+                self._summary_executor.submit(self._summarize_history, dropped)
         else:
             print("Error: No screenshot captured")
     
+    def _summarize_history(self, turns):
+        """
+        Fold dropped history turns into the session's running summary.
+        
+        Args:
+            turns (tuple): (question, answer) pairs that left the history window
+        """
+        session_manager = self.session_manager
+        session_manager.history_summary = self.ai_connector.summarize_history(
+            session_manager.history_summary, turns
+        )
+    
     def _handle_signal(self, sig, frame):
         """Handle termination signals."""
         self._shutdown()
@@ -1,8 +1,19 @@
 import os
 import yaml
+import atexit
 import logging
+import logging.handlers
+import queue
+import types
+from collections.abc import Mapping
 from pathlib import Path
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
 class ConfigManager:
     """Handles loading and accessing configuration settings."""
     
@@ -10,59 +21,131 @@ class ConfigManager:
         self.config_path = config_path
         self.config = self._load_config()
         self._setup_logging()
-        self._ensure_directories()
+        
+        # Memoize frequently used settings
+        self.shortcut_key = self.get('keyboard', 'shortcut_key', default='ctrl+alt+a')
+        self.gemini_api_key = self.get('ai', 'api_key', default='')
+        self.session_file = os.path.join(
+            self.get('session', 'sessions_directory', default='sessions'),
+            self.get('session', 'default_session_file', default='ai_assistant_session.md')
+        )
         
     def _load_config(self):
         """Load configuration from YAML file."""
         try:
-            with open(self.config_path, 'r') as file:
-                config = yaml.safe_load(file)
-                return config
+            with open(self.config_path, 'rb') as file:
+                config = yaml.load(file.read(), Loader=_Loader) or {}
         except FileNotFoundError:
             raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
         except yaml.YAMLError as e:
             raise ValueError(f"Error parsing configuration file: {e}")
+        
+        # Expose read-only views at every level so callers can't mutate the
+        # loaded config, or leave the flattened lookup table stale
+        config = self._freeze(config)
+        
+        # Flattened view of all leaf values keyed by their path tuple
+        self._flat = dict(self._flatten(config))
+        return config
+    
+    def _freeze(self, value):
+        """
+        Recursively convert a loaded config value to read-only containers.
+        
+        Args:
+            value: Parsed YAML value
+            
+        Returns:
+            MappingProxyType for mappings, tuple for lists, otherwise the value itself
+        """
+        if isinstance(value, dict):
+            return types.MappingProxyType({key: self._freeze(item) for key, item in value.items()})
+        if isinstance(value, list):
+            return tuple(self._freeze(item) for item in value)
+        return value
+    
+    def _flatten(self, cfg, prefix=()):
+        """
+        Walk a nested config mapping and yield leaf values.
+        
+        Args:
+            cfg (Mapping): Config subtree to walk
+            prefix (tuple): Path of keys leading to this subtree
+            
+        Yields:
+            tuple: (path tuple, leaf value)
+        """
+        for key, value in cfg.items():
+            path = prefix + (key,)
+            if isinstance(value, Mapping):
+                yield from self._flatten(value, path)
+            else:
+                yield path, value
     
     def _setup_logging(self):
         """Set up logging based on configuration."""
-        log_level = getattr(logging, self.config.get('logging', {}).get('level', 'INFO'))
-        log_file = self.config.get('logging', {}).get('file', 'ai_assistant.log')
+        # Another ConfigManager in this process already configured logging
+        if logging.getLogger().handlers:
+            return
         
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
+        log_level = getattr(logging, self.get('logging', 'level', default='INFO'))
+        log_file = self.get('logging', 'file', default='ai_assistant.log')
         
-    def _ensure_directories(self):
-        """Ensure required directories exist."""
-        sessions_dir = self.config.get('session', {}).get('sessions_directory', 'sessions')
-        os.makedirs(sessions_dir, exist_ok=True)
-    
-    def get(self, section, key=None, default=None):
-        """Get a configuration value."""
-        if key is None:
-            return self.config.get(section, default)
+        formatter = logging.Formatter('{asctime} - {name} - {levelname} - {message}', style='{')
+        handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        # Log calls only enqueue records; formatting and I/O run on a background thread
+        log_queue = queue.SimpleQueue()
+        root_logger = logging.getLogger()
+        root_logger.setLevel(log_level)
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        
+        self.log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.log_listener.start()
+        
+        # Flush queued records before the interpreter exits
+        atexit.register(self.log_listener.stop)
+        
+    def get(self, section, *path, default=None):
+        """
+        Get a configuration value.
+        
+        Args:
+            section (str): Top-level config section
+            *path (str): Nested keys below the section
+            default: Value returned when the key is missing
+            
+        Returns:
+            The configured value, or default if not set
+        """
+        key = (section,) + path
+        try:
+            return self._flat[key]
+        except KeyError:
+            pass
         
-        return self.config.get(section, {}).get(key, default)
+        # Not a leaf, so the key may point at a subtree
+        node = self.config
+        for part in key:
+            if not isinstance(node, Mapping) or part not in node:
+                return default
+            node = node[part]
+        return node
     
     def get_shortcut_key(self):
         """Get the keyboard shortcut configuration."""
-        return self.config.get('keyboard', {}).get('shortcut_key', 'ctrl+alt+a')
+        return self.shortcut_key
     
     def get_session_file(self):
         """Get the current session file path."""
-        sessions_dir = self.config.get('session', {}).get('sessions_directory', 'sessions')
-        default_file = self.config.get('session', {}).get('default_session_file', 'ai_assistant_session.md')
-        return os.path.join(sessions_dir, default_file)
+        return self.session_file
     
     def get_new_session_on_startup(self):
         """Check if a new session should be created on startup."""
-        return self.config.get('session', {}).get('new_session_on_startup', False)
+        return self.get('session', 'new_session_on_startup', default=False)
     
     def get_gemini_api_key(self):
         """Get the Gemini API key."""
-        return self.config.get('ai', {}).get('api_key', '')
+        return self.gemini_api_key
@@ -1,29 +1,182 @@
 import logging
+import asyncio
+import datetime
+import threading
+import functools
+import time
+import random
 import google.generativeai as genai
-from PIL import Image
-import io
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import caching
 import os
+from pathlib import Path
+from core.query_cache import QueryCache
 
 logger = logging.getLogger(__name__)
 
+# Per-query prompt text that accompanies the screenshot
+QUESTION_TEMPLATE = "User's question (referring to the attached screenshot): {question}"
+
+# Instruction for condensing turns that fall out of the history window
+SUMMARY_TEMPLATE = (
+    "Update the summary of an earlier conversation with the new turns below. "
+    "Keep facts, names and decisions the user may refer back to. "
+    "Reply with the summary only, in under 150 words.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+@functools.lru_cache(maxsize=8)
+def _read_prompt(path, mtime):
+    """
+    Read a prompt file, memoized per path and modification time.
+    
+    Args:
+        path (str): Path to the prompt file
+        mtime (float): Modification time, so edits to the file are picked up
+        
+    Returns:
+        str: Stripped prompt text
+    """
+    return Path(path).read_text(encoding="utf-8").strip()
+
+# Transient Gemini errors worth retrying with exponential backoff
+RETRYABLE_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    TimeoutError,
+)
+
+# Errors from a request made with an expired, evicted or inaccessible context cache
+CONTEXT_CACHE_ERRORS = (
+    api_exceptions.NotFound,
+    api_exceptions.PermissionDenied,
+    api_exceptions.FailedPrecondition,
+)
+
 class AIConnector:
     """Handles interactions with the Gemini API."""
     
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.api_key = config_manager.get_gemini_api_key()
-        self.model_name = config_manager.get("ai", "model", "gemini-1.5-flash")
-        self.temperature = config_manager.get("ai", "temperature", 0.2)
-        self.max_tokens = config_manager.get("ai", "max_tokens", 1024)
+        self.model_name = config_manager.get("ai", "model", default="gemini-1.5-flash")
+        self.temperature = config_manager.get("ai", "temperature", default=0.2)
+        self.max_tokens = config_manager.get("ai", "max_tokens", default=1024)
         self.system_prompt = self._load_system_prompt()
+        self.generation_config = {
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_tokens,
+        }
+        
+        # Model is built once and reused; the system prompt is sent inline as a
+        # dedicated instruction block
+        self.model = genai.GenerativeModel(
+            model_name=self.model_name,
+            system_instruction=self.system_prompt,
+            generation_config=self.generation_config
+        )
+        
+        # Plain model for condensing older history; no system prompt or screenshot
+        self.summary_model = genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config={"temperature": 0, "max_output_tokens": 256}
+        )
+        
+        # LRU cache of answers keyed by question, screenshot and recent history.
+        # Off by default: interactive queries never repeat because each answer
+        # extends the history, so it only pays off for process_queries batches
+        cache_size = config_manager.get("ai", "response_cache_size", default=0)
+        cache_ttl = config_manager.get("ai", "response_cache_ttl", default=3600)
+        self.response_cache = QueryCache(cache_size, cache_ttl) if cache_size else None
+        
+        # Limits for concurrent async requests and retried requests
+        self.max_concurrency = config_manager.get("ai", "max_concurrency", default=4)
+        self.max_retries = config_manager.get("ai", "max_retries", default=4)
+        
+        # Server-side context cache holding the system prompt
+        self.use_context_cache = config_manager.get("ai", "use_context_cache", default=False)
+        self.context_cache_ttl = config_manager.get("ai", "context_cache_ttl", default=3600)
+        self.cached_content = None
+        self.cached_model = None
+        self._stop_cache_refresh = threading.Event()
         
         # Initialize Gemini API
         if self.api_key:
             genai.configure(api_key=self.api_key)
             logger.info(f"Initialized Gemini API with model: {self.model_name}")
+            
+            if self.use_context_cache:
+                self._create_context_cache()
         else:
             logger.warning("No Gemini API key provided. Please set one in the config file.")
     
+    def _create_context_cache(self):
+        """Upload the system prompt to a Gemini context cache and keep it alive."""
+        try:
+            self.cached_content = caching.CachedContent.create(
+                model=self.model_name,
+                system_instruction=self.system_prompt,
+                ttl=datetime.timedelta(seconds=self.context_cache_ttl)
+            )
+            self.cached_model = genai.GenerativeModel.from_cached_content(
+                cached_content=self.cached_content,
+                generation_config=self.generation_config
+            )
+            logger.info(f"Created Gemini context cache: {self.cached_content.name}")
+        except Exception as e:
+            logger.warning(f"Could not create Gemini context cache, sending the prompt inline: {e}")
+            return
+        
+        threading.Thread(target=self._refresh_context_cache, daemon=True).start()
+    
+    def _refresh_context_cache(self):
+        """Extend the context cache TTL before it expires."""
+        ttl = datetime.timedelta(seconds=self.context_cache_ttl)
+        while not self._stop_cache_refresh.wait(self.context_cache_ttl * 0.8):
+            cached_content = self.cached_content
+            if cached_content is None:
+                return
+            try:
+                cached_content.update(ttl=ttl)
+                logger.debug("Refreshed Gemini context cache TTL")
+            except Exception as e:
+                logger.warning(f"Could not refresh Gemini context cache, sending the prompt inline: {e}")
+                self.cached_model = None
+                self.cached_content = None
+                return
+    
+    def _drop_context_cache(self, error):
+        """
+        Stop using a context cache that Gemini no longer accepts.
+        
+        Args:
+            error (Exception): Error raised by a request made with the cache
+            
+        Returns:
+            GenerativeModel: Model that sends the system prompt inline
+        """
+        logger.warning(f"Gemini context cache unusable, sending the prompt inline: {error}")
+        self._stop_cache_refresh.set()
+        self.cached_model = None
+        self.cached_content = None
+        return self.model
+    
+    def close(self):
+        """Stop refreshing the context cache and delete it so it is not billed until expiry."""
+        self._stop_cache_refresh.set()
+        cached_content = self.cached_content
+        self.cached_model = None
+        self.cached_content = None
+        if cached_content is None:
+            return
+        
+        try:
+            cached_content.delete()
+            logger.info(f"Deleted Gemini context cache: {cached_content.name}")
+        except Exception as e:
+            logger.warning(f"Could not delete Gemini context cache: {e}")
+    
     def _load_system_prompt(self):
         """
         Load system prompt from file specified in config.
@@ -31,7 +184,7 @@ class AIConnector:
         Returns:
             str: System prompt text or default prompt if file not found
         """
-        prompt_file = self.config_manager.get("ai", "system_prompt_file", "prompts/system_prompt.md")
+        prompt_file = self.config_manager.get("ai", "system_prompt_file", default="prompts/system_prompt.md")
         
         # Default prompt in case file is not found
         default_prompt = (
@@ -40,65 +193,389 @@ class AIConnector:
         )
         
         try:
-            if os.path.exists(prompt_file):
-                with open(prompt_file, 'r', encoding='utf-8') as file:
-                    prompt = file.read().strip()
-                logger.info(f"Loaded system prompt from {prompt_file}")
-                return prompt
-            else:
-                logger.warning(f"System prompt file not found: {prompt_file}. Using default prompt.")
-                return default_prompt
+            prompt = _read_prompt(prompt_file, os.path.getmtime(prompt_file))
+            logger.info(f"Loaded system prompt from {prompt_file}")
+            return prompt
+        except FileNotFoundError:
+            logger.warning(f"System prompt file not found: {prompt_file}. Using default prompt.")
+            return default_prompt
         except Exception as e:
             logger.error(f"Error loading system prompt: {e}. Using default prompt.")
             return default_prompt
     
-    def process_query(self, question, screenshot_data, conversation_history=None):
+    def _split_history(self, conversation_history, recent_turns=2):
         """
-        Process a query with Gemini, including screenshot data.
+        Split conversation history into older turns and the latest turns.
+        
+        Older turns change least between calls, so they are sent ahead of the
+        per-query content where the provider's prompt cache can reuse them.
+        
+        Args:
+            conversation_history (tuple): (question, answer) pairs, oldest first
+            recent_turns (int): Number of trailing turns to treat as recent
+            
+        Returns:
+            tuple: (stable_history, recent_history) formatted strings
+        """
+        if not conversation_history:
+            return "", ""
+        
+        split = max(len(conversation_history) - recent_turns, 0)
+        return (
+            self._format_turns(conversation_history[:split]),
+            self._format_turns(conversation_history[split:])
+        )
+    
+    def _format_turns(self, turns):
+        """
+        Format conversation turns as markdown for the prompt.
+        
+        Args:
+            turns (tuple): (question, answer) pairs
+            
+        Returns:
+            str: Formatted turns, or an empty string if there are none
+        """
+        return "\n\n".join(
+            f"## Question\n\n{question}\n\n## Answer\n\n{answer}"
+            for question, answer in turns
+        )
+    
+    def summarize_history(self, summary, turns):
+        """
+        Fold turns that fell out of the history window into a short summary.
+        
+        Args:
+            summary (str): Current summary, empty if there is none yet
+            turns (tuple): (question, answer) pairs to add, oldest first
+            
+        Returns:
+            str: Updated summary, or the current one if the request fails
+        """
+        if not self.api_key or not turns:
+            return summary
+        
+        try:
+            prompt = SUMMARY_TEMPLATE.format(
+                summary=summary or "(none)",
+                turns=self._format_turns(turns)
+            )
+            response = self.summary_model.generate_content(prompt)
+            logger.info(f"Summarized {len(turns)} older interactions")
+            return response.text.strip()
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {e}")
+            return summary
+    
+    def _cache_key(self, question, screenshot, conversation_history, history_summary="", history_turns=4):
+        """
+        Build a response cache key from the query context.
+        
+        History turns are immutable tuples of strings, so they can be part of
+        the key directly and Python's cached string hashes are reused.
         
         Args:
             question (str): User's question
-            screenshot_data (bytes): Screenshot image data
-            conversation_history (list, optional): Previous conversation history
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple): (question, answer) pairs, oldest first
+            history_summary (str): Summary of turns older than the history
+            history_turns (int): Number of trailing history turns to include
             
         Returns:
-            str: Response from Gemini
+            tuple: Key identifying the query context
+        """
+        history_tail = conversation_history[-history_turns:] if conversation_history else ()
+        return (question.strip().lower(), screenshot.digest, history_summary, history_tail)
+    
+    def _build_request(self, question, screenshot, conversation_history, history_summary=""):
+        """
+        Select the Gemini model and build the request contents for a query.
+        
+        Args:
+            question (str): User's question
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple): Recent (question, answer) pairs
+            history_summary (str): Summary of turns older than the history
+            
+        Returns:
+            tuple: (GenerativeModel, list of request contents)
+        """
+        # Older history is kept apart from the latest turns so the request
+        # prefix (system prompt + stable history) is identical across calls
+        stable_history, recent_history = self._split_history(conversation_history)
+        
+        # Reference the cached system prompt when available
+        model = self.cached_model or self.model
+        
+        # Stable content first, per-query content (question + screenshot) last
+        contents = []
+        if history_summary:
+            contents.append("Summary of earlier conversation:\n" + history_summary)
+        if stable_history:
+            contents.append("Previous conversation:\n" + stable_history)
+        if recent_history:
+            contents.append("Recent conversation:\n" + recent_history)
+        contents.append(QUESTION_TEMPLATE.format(question=question))
+        
+        # Send the already-encoded image bytes as-is instead of decoding them
+        contents.append({"mime_type": screenshot.mime_type, "data": screenshot.data})
+        
+        return model, contents
+    
+    def _retry_delay(self, attempt, error):
+        """
+        Get the backoff delay before retrying a failed request.
+        
+        Args:
+            attempt (int): Zero-based number of the attempt that failed
+            error (Exception): Retryable error raised by the attempt
+            
+        Returns:
+            float: Delay in seconds, doubling per attempt with random jitter
+            
+        Raises:
+            Exception: The error itself, once all retries are used up
+        """
+        if attempt >= self.max_retries:
+            raise error
+        
+        delay = 0.5 * 2 ** attempt * random.uniform(0.5, 1.5)
+        logger.warning(f"Gemini request failed ({error}), retrying in {delay:.1f}s")
+        return delay
+    
+    def _generate_with_retry(self, model, contents):
+        """
+        Call generate_content, retrying transient errors with exponential backoff.
+        
+        A request rejected because of the context cache is retried once with
+        the prompt sent inline.
+        
+        Args:
+            model (GenerativeModel): Model to query
+            contents (list): Request contents
+            
+        Returns:
+            GenerateContentResponse: Response from Gemini
+        """
+        attempt = 0
+        while True:
+            try:
+                return model.generate_content(contents)
+            except RETRYABLE_ERRORS as e:
+                time.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+            except CONTEXT_CACHE_ERRORS as e:
+                if model is self.model:
+                    raise
+                model = self._drop_context_cache(e)
+    
+    async def _generate_with_retry_async(self, model, contents):
+        """
+        Async counterpart of _generate_with_retry.
+        
+        Args:
+            model (GenerativeModel): Model to query
+            contents (list): Request contents
+            
+        Returns:
+            GenerateContentResponse: Response from Gemini
+        """
+        attempt = 0
+        while True:
+            try:
+                return await model.generate_content_async(contents)
+            except RETRYABLE_ERRORS as e:
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+            except CONTEXT_CACHE_ERRORS as e:
+                if model is self.model:
+                    raise
+                model = self._drop_context_cache(e)
+    
+    def _prepare_query(self, question, screenshot, conversation_history, history_summary):
+        """
+        Check the API key and response cache before a query is sent.
+        
+        Args:
+            question (str): User's question
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple): Recent (question, answer) pairs
+            history_summary (str): Summary of turns older than the history
+            
+        Returns:
+            tuple: (answer, cache_key) where answer is an error message or cached
+                answer to return without querying, or None to go ahead
         """
         if not self.api_key:
             error_msg = "Gemini API key not configured. Please add your API key to the config file."
             logger.error(error_msg)
-            return error_msg
+            return error_msg, None
+        
+        if not self.response_cache:
+            return None, None
+        
+        cache_key = self._cache_key(question, screenshot, conversation_history, history_summary)
+        return self.response_cache.get(cache_key), cache_key
+    
+    def _store_answer(self, cache_key, answer):
+        """
+        Cache an answer if the response cache is enabled.
+        
+        Args:
+            cache_key (tuple): Key from _prepare_query, or None
+            answer (str): Answer to cache
+        """
+        if cache_key is not None:
+            self.response_cache.set(cache_key, answer)
+    
+    def _error_response(self, error):
+        """
+        Log a failed query and build the message returned in place of an answer.
+        
+        Args:
+            error (Exception): Error raised while querying Gemini
+            
+        Returns:
+            str: Message to speak to the user
+        """
+        logger.error(f"Error processing query with Gemini: {error}")
+        return f"Sorry, I encountered an error: {str(error)}"
+    
+    def process_query(self, question, screenshot, conversation_history=None, history_summary=""):
+        """
+        Process a query with Gemini, including screenshot data.
+        
+        Args:
+            question (str): User's question
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple, optional): Recent (question, answer) pairs
+            history_summary (str, optional): Summary of turns older than the history
+            
+        Returns:
+            str: Response from Gemini
+        """
+        answer, cache_key = self._prepare_query(question, screenshot, conversation_history, history_summary)
+        if answer is not None:
+            return answer
         
         try:
-            # Load screenshot data as PIL Image
-            image = Image.open(io.BytesIO(screenshot_data))
-            
-            # Generate context from conversation history if provided
-            context = ""
-            if conversation_history and len(conversation_history) > 0:
-                # Keep it simple for the prototype
-                context = "Previous conversation:\n" + conversation_history + "\n\n"
-            
-            # Set up the model
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config={
-                    "temperature": self.temperature,
-                    "max_output_tokens": self.max_tokens,
-                }
+            model, contents = self._build_request(
+                question, screenshot, conversation_history, history_summary
             )
             
-            # Construct the prompt with system prompt
-            prompt = f"{self.system_prompt}\n\n{context}User's question (referring to the attached screenshot): {question}"
-            
             # Generate response with both text and image input
-            response = model.generate_content([prompt, image])
+            response = self._generate_with_retry(model, contents)
             
             answer = response.text
             logger.info("Received response from Gemini API")
+            
+            self._store_answer(cache_key, answer)
             return answer
             
         except Exception as e:
-            error_msg = f"Error processing query with Gemini: {e}"
-            logger.error(error_msg)
-            return f"Sorry, I encountered an error: {str(e)}"
\ No newline at end of file
+            return self._error_response(e)
+    
+    def stream_query(self, question, screenshot, conversation_history=None, history_summary=""):
+        """
+        Process a query with Gemini, yielding the answer text as it is generated.
+        
+        Args:
+            question (str): User's question
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple, optional): Recent (question, answer) pairs
+            history_summary (str, optional): Summary of turns older than the history
+            
+        Yields:
+            str: Successive pieces of the response from Gemini
+        """
+        answer, cache_key = self._prepare_query(question, screenshot, conversation_history, history_summary)
+        if answer is not None:
+            yield answer
+            return
+        
+        parts = []
+        try:
+            model, contents = self._build_request(
+                question, screenshot, conversation_history, history_summary
+            )
+            
+            # Stream the response so speech can start before generation finishes;
+            # transient and context cache errors are only retried until the
+            # first text is yielded
+            attempt = 0
+            while True:
+                try:
+                    for chunk in model.generate_content(contents, stream=True):
+                        text = chunk.text
+                        if text:
+                            parts.append(text)
+                            yield text
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if parts:
+                        raise
+                    time.sleep(self._retry_delay(attempt, e))
+                    attempt += 1
+                except CONTEXT_CACHE_ERRORS as e:
+                    if parts or model is self.model:
+                        raise
+                    model = self._drop_context_cache(e)
+            
+            logger.info("Received streamed response from Gemini API")
+            self._store_answer(cache_key, "".join(parts))
+            
+        except Exception as e:
+            yield self._error_response(e)
+    
+    async def process_query_async(self, question, screenshot, conversation_history=None, history_summary=""):
+        """
+        Process a query with Gemini without blocking the calling event loop.
+        
+        Transient API errors are retried with exponential backoff.
+        
+        Args:
+            question (str): User's question
+            screenshot (Screenshot): Captured screenshot
+            conversation_history (tuple, optional): Recent (question, answer) pairs
+            history_summary (str, optional): Summary of turns older than the history
+            
+        Returns:
+            str: Response from Gemini
+        """
+        answer, cache_key = self._prepare_query(question, screenshot, conversation_history, history_summary)
+        if answer is not None:
+            return answer
+        
+        try:
+            model, contents = self._build_request(
+                question, screenshot, conversation_history, history_summary
+            )
+            
+            response = await self._generate_with_retry_async(model, contents)
+            
+            answer = response.text
+            logger.info("Received response from Gemini API")
+            
+            self._store_answer(cache_key, answer)
+            return answer
+            
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def process_queries(self, queries):
+        """
+        Process several queries concurrently, bounded by ai.max_concurrency.
+        
+        Args:
+            queries (list): (question, screenshot, conversation_history) tuples
+            
+        Returns:
+            list: Responses from Gemini, in the same order as the queries
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run(query):
+            async with semaphore:
+                return await self.process_query_async(*query)
+        
+        return await asyncio.gather(*(run(query) for query in queries))
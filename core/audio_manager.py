@@ -1,63 +1,154 @@
 import logging
 import tempfile
+import hashlib
+import io
 import os
+import time
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 import threading
 import pygame
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from gtts import gTTS
 from groq import Groq
 
 logger = logging.getLogger(__name__)
 
+# Seconds between checks for the end of pygame music playback
+PLAYBACK_POLL_INTERVAL = 0.1
+
 class AudioManager:
     """Handles audio recording, speech-to-text, and text-to-speech functionality."""
     
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.recording = False
-        self.frames = []
         self.sample_rate = 16000
         self.channels = 1
         
+        # Preallocated recording buffer reused for every utterance, grown if a
+        # recording outlasts it
+        buffer_seconds = config_manager.get("speech", "recording_buffer_seconds", default=60)
+        self.buffer = np.empty((int(buffer_seconds * self.sample_rate), self.channels), dtype=np.int16)
+        self.write_pos = 0
+        
+        # Recordings whose peak amplitude stays below this are treated as silence
+        self.silence_threshold = config_manager.get("speech", "silence_threshold", default=500)
+        
         # Load STT configuration
-        self.stt_engine = config_manager.get("speech", "stt", {}).get("engine", "groq")
-        self.groq_api_key = config_manager.get("speech", "stt", {}).get("api_key", "")
-        self.groq_model = config_manager.get("speech", "stt", {}).get("model", "whisper-large-v3-turbo")
+        self.stt_engine = config_manager.get("speech", "stt", "engine", default="groq")
+        self.groq_api_key = config_manager.get("speech", "stt", "api_key", default="")
+        self.groq_model = config_manager.get("speech", "stt", "model", default="whisper-large-v3-turbo")
+        
+        # One client for all transcriptions so its connection pool is reused
+        self.groq_client = Groq(api_key=self.groq_api_key) if self.groq_api_key else None
+        
+        # Transcribe completed chunks while still recording (0 disables chunking)
+        self.stt_chunk_seconds = config_manager.get("speech", "stt", "chunk_seconds", default=0)
+        self._stt_executor = ThreadPoolExecutor(max_workers=4)
+        self._chunk_futures = []
+        self._chunk_start = 0
+        self._chunk_stop = threading.Event()
+        self._chunk_thread = None
         
         # Load TTS configuration
-        self.tts_engine = config_manager.get("speech", "tts", {}).get("engine", "gtts")
-        self.tts_rate = config_manager.get("speech", "tts", {}).get("rate", 150)
-        self.tts_volume = config_manager.get("speech", "tts", {}).get("volume", 1.0)
-        self.tts_voice = config_manager.get("speech", "tts", {}).get("voice", None)
+        self.tts_engine = config_manager.get("speech", "tts", "engine", default="gtts")
+        self.tts_rate = config_manager.get("speech", "tts", "rate", default=150)
+        self.tts_volume = config_manager.get("speech", "tts", "volume", default=1.0)
+        self.tts_voice = config_manager.get("speech", "tts", "voice", default=None)
+        self.tts_lang = "en"
+        
+        # On-disk cache of synthesized phrases (0 disables it). Off by default:
+        # streamed answer sentences rarely repeat, so it only pays off for
+        # setups that speak fixed phrases
+        self.tts_cache_size = config_manager.get("speech", "tts", "cache_size", default=0)
+        self.tts_cache_dir = Path(
+            config_manager.get("speech", "tts", "cache_dir", default="~/.cache/ai-assistant/tts")
+        ).expanduser()
+        if self.tts_cache_size:
+            self.tts_cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Separate single-worker stages so synthesis overlaps playback
+        self._synth_executor = ThreadPoolExecutor(max_workers=1)
+        self._playback_executor = ThreadPoolExecutor(max_workers=1)
+        self._pending_speech = []
+        
+        # Bumped by stop_speaking so in-progress streamed speech can bail out
+        self._speech_generation = 0
+        
+        # Local Piper voice streaming PCM straight to the output device
+        self.piper_voice = None
+        self._piper_stream = None
+        if self.tts_engine.lower() == "piper":
+            self._load_piper()
         
         # Initialize pygame mixer for audio playback
         pygame.mixer.init()
         logger.info(f"Audio Manager initialized with TTS engine: {self.tts_engine}")
     
+    def _load_piper(self):
+        """Load the configured Piper voice and open its output stream, falling back to gTTS on failure."""
+        model_path = self.config_manager.get("speech", "tts", "piper_model", default="en_US-lessac-medium.onnx")
+        try:
+            from piper.voice import PiperVoice
+            
+            self.piper_voice = PiperVoice.load(model_path)
+            self._piper_stream = sd.OutputStream(
+                samplerate=self.piper_voice.config.sample_rate,
+                channels=1,
+                dtype="int16"
+            )
+            self._piper_stream.start()
+            logger.info(f"Loaded Piper voice: {model_path}")
+        except Exception as e:
+            logger.warning(f"Could not load Piper voice ({e}). Using gTTS as fallback.")
+            self.piper_voice = None
+            self._piper_stream = None
+            self.tts_engine = "gtts"
+    
     def start_recording(self):
         """Start recording audio from the microphone."""
         if self.recording:
             return
         
-        self.frames = []
+        self.write_pos = 0
         self.recording = True
         
         def callback(indata, frames, time, status):
             if status:
                 logger.warning(f"Audio callback status: {status}")
             if self.recording:
-                self.frames.append(indata.copy())
+                start = self.write_pos
+                end = start + frames
+                
+                # Double the buffer when full so long recordings are not cut off
+                if end > len(self.buffer):
+                    grown = np.empty((max(len(self.buffer) * 2, end), self.channels), dtype=np.int16)
+                    grown[:start] = self.buffer[:start]
+                    self.buffer = grown
+                
+                self.buffer[start:end] = indata
+                self.write_pos = end
         
         try:
             self.stream = sd.InputStream(
                 callback=callback,
                 channels=self.channels,
-                samplerate=self.sample_rate
+                samplerate=self.sample_rate,
+                dtype="int16"
             )
             self.stream.start()
             logger.info("Audio recording started")
+            
+            # Start uploading completed chunks in the background
+            self.discard_recording()
+            self._chunk_start = 0
+            if self.stt_chunk_seconds and self.stt_engine == "groq" and self.groq_api_key:
+                self._chunk_stop.clear()
+                self._chunk_thread = threading.Thread(target=self._submit_chunks_while_recording, daemon=True)
+                self._chunk_thread.start()
         except Exception as e:
             logger.error(f"Error starting audio recording: {e}")
             self.recording = False
@@ -66,11 +157,14 @@ class AudioManager:
         """
         Stop recording audio and return the recorded data.
         
+        The returned buffer is reused by the next recording, so callers must
+        finish with it before recording again.
+        
         Returns:
-            numpy.ndarray: Recorded audio data
+            tuple: (numpy.ndarray recording buffer, number of recorded samples)
         """
         if not self.recording:
-            return None
+            return None, 0
         
         self.recording = False
         
@@ -78,35 +172,126 @@ class AudioManager:
             self.stream.stop()
             self.stream.close()
             
-            if not self.frames:
-                logger.warning("No audio data recorded")
-                return None
+            if self._chunk_thread:
+                self._chunk_stop.set()
+                self._chunk_thread.join()
+                self._chunk_thread = None
             
-            # Combine all recorded frames
-            audio_data = np.concatenate(self.frames, axis=0)
-            logger.info(f"Audio recording stopped. Duration: {len(audio_data) / self.sample_rate:.2f} seconds")
+            nsamples = self.write_pos
+            if nsamples == 0:
+                logger.warning("No audio data recorded")
+                return None, 0
             
-            return audio_data
+            logger.info(f"Audio recording stopped. Duration: {nsamples / self.sample_rate:.2f} seconds")
+            return self.buffer, nsamples
         except Exception as e:
             logger.error(f"Error stopping audio recording: {e}")
-            return None
+            return None, 0
+    
+    def discard_recording(self):
+        """
+        Drop a recording that will not be transcribed.
+        
+        Chunk uploads that have not started yet are cancelled, since they
+        read from the buffer the next recording overwrites.
+        """
+        for future in self._chunk_futures:
+            future.cancel()
+        self._chunk_futures = []
+    
+    def _submit_chunks_while_recording(self):
+        """Send each completed chunk of the recording for transcription while recording continues."""
+        chunk_samples = int(self.stt_chunk_seconds * self.sample_rate)
+        
+        while not self._chunk_stop.wait(0.25):
+            if self.write_pos - self._chunk_start < chunk_samples:
+                continue
+            
+            split = self._find_quiet_split(self._chunk_start + chunk_samples)
+            chunk = self.buffer[self._chunk_start:split]
+            self._chunk_futures.append(self._stt_executor.submit(self._transcribe_chunk, chunk))
+            self._chunk_start = split
     
-    def transcribe_audio(self, audio_data):
+    def _find_quiet_split(self, end, search_seconds=0.5, frame_samples=320):
+        """
+        Find the quietest point just before a chunk end, so words are not cut in half.
+        
+        Args:
+            end (int): Sample index the chunk would end at
+            search_seconds (float): How far back from end to search
+            frame_samples (int): Size of the frames compared for loudness
+            
+        Returns:
+            int: Sample index to split the recording at
+        """
+        search = int(search_seconds * self.sample_rate) // frame_samples * frame_samples
+        start = max(end - search, self._chunk_start + frame_samples)
+        search = (end - start) // frame_samples * frame_samples
+        if search <= 0:
+            return end
+        
+        frames = self.buffer[end - search:end, 0].reshape(-1, frame_samples).astype(np.int32)
+        quietest = int(np.abs(frames).max(axis=1).argmin())
+        return end - search + quietest * frame_samples + frame_samples // 2
+    
+    def is_silent(self, audio_data, nsamples):
+        """
+        Check whether a recording contains no speech worth transcribing.
+        
+        Only every 8th sample is scanned, which is plenty to find the peak
+        of speech while touching a fraction of the buffer.
+        
+        Args:
+            audio_data (numpy.ndarray): Recording buffer returned by stop_recording
+            nsamples (int): Number of recorded samples in the buffer
+            
+        Returns:
+            bool: True if the peak amplitude is below the silence threshold
+        """
+        if nsamples == 0:
+            return True
+        
+        samples = audio_data[:nsamples:8]
+        peak = max(int(samples.max()), -int(samples.min()))
+        return peak < self.silence_threshold
+    
+    def transcribe_audio(self, audio_data, nsamples):
         """
         Convert audio data to text using the configured STT engine.
         
         Args:
-            audio_data (numpy.ndarray): Audio data to transcribe
+            audio_data (numpy.ndarray): Recording buffer returned by stop_recording
+            nsamples (int): Number of recorded samples in the buffer
             
         Returns:
             str: Transcribed text
         """
-        if audio_data is None or (isinstance(audio_data, np.ndarray) and audio_data.size == 0):
+        if nsamples == 0:
             logger.warning("No audio data to transcribe")
             return ""
         
         if self.stt_engine == "groq":
-            return self._transcribe_with_groq(audio_data)
+            if not self._chunk_futures:
+                return self._transcribe_with_groq(audio_data[:nsamples])
+            
+            # Only the tail after the last uploaded chunk is still untranscribed
+            futures = self._chunk_futures
+            if nsamples > self._chunk_start:
+                futures.append(self._stt_executor.submit(
+                    self._transcribe_chunk, audio_data[self._chunk_start:nsamples]
+                ))
+            self._chunk_futures = []
+            
+            texts = [future.result() for future in futures]
+            
+            # A missing chunk would leave a gap mid-question; redo it in one request
+            if None in texts:
+                logger.warning("A chunk transcription failed, transcribing the whole recording")
+                return self._transcribe_with_groq(audio_data[:nsamples])
+            
+            transcribed_text = " ".join(text for text in texts if text)
+            logger.info(f"Audio transcribed: \"{transcribed_text}\"")
+            return transcribed_text
         else:
             logger.error(f"Unsupported STT engine: {self.stt_engine}")
             return ""
@@ -123,31 +308,11 @@ class AudioManager:
         """
         try:
             # Check if API key is available
-            if not self.groq_api_key:
+            if not self.groq_client:
                 logger.error("Groq API key not configured")
                 return "Error: Groq API key not configured. Please add your API key to the config file."
             
-            # Save audio to a temporary file for processing
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-            
-            sf.write(tmp_path, audio_data, self.sample_rate)
-            
-            # Initialize Groq client
-            client = Groq(api_key=self.groq_api_key)
-            
-            # Use the audio transcriptions API
-            with open(tmp_path, "rb") as audio_file:
-                transcription = client.audio.transcriptions.create(
-                    file=(tmp_path, audio_file.read()),
-                    model=self.groq_model,
-                )
-            
-            # Clean up temporary file
-            os.unlink(tmp_path)
-            
-            # Get transcribed text
-            transcribed_text = transcription.text.strip()
+            transcribed_text = self._request_groq_transcription(audio_data)
             logger.info(f"Audio transcribed: \"{transcribed_text}\"")
             return transcribed_text
             
@@ -155,10 +320,50 @@ class AudioManager:
             logger.error(f"Error transcribing audio with Groq: {e}")
             return f"Error: {str(e)}"
     
+    def _transcribe_chunk(self, audio_data):
+        """
+        Transcribe one chunk of a recording using the Groq API.
+        
+        Args:
+            audio_data (numpy.ndarray): Audio data of the chunk
+            
+        Returns:
+            str: Transcribed text, or None if the request failed
+        """
+        try:
+            return self._request_groq_transcription(audio_data)
+        except Exception as e:
+            logger.warning(f"Error transcribing audio chunk with Groq: {e}")
+            return None
+    
+    def _request_groq_transcription(self, audio_data):
+        """
+        Upload audio to the Groq transcription API.
+        
+        Args:
+            audio_data (numpy.ndarray): Audio data to transcribe
+            
+        Returns:
+            str: Transcribed text
+        """
+        # Encode the audio as 16-bit WAV in memory for upload
+        wav_buffer = io.BytesIO()
+        sf.write(wav_buffer, audio_data, self.sample_rate, format="WAV", subtype="PCM_16")
+        
+        # Use the audio transcriptions API
+        transcription = self.groq_client.audio.transcriptions.create(
+            file=("audio.wav", wav_buffer.getvalue()),
+            model=self.groq_model,
+        )
+        return transcription.text.strip()
+    
     def speak_text(self, text):
         """
         Convert text to speech using the configured TTS engine.
         
+        Speech is handed to the persistent TTS workers, so it plays after any
+        speech already queued instead of racing it for the mixer.
+        
         Args:
             text (str): Text to speak
         """
@@ -166,40 +371,207 @@ class AudioManager:
             logger.warning("No text to speak")
             return
         
-        # Select TTS engine based on configuration
-        if self.tts_engine.lower() == "gtts":
-            threading.Thread(target=self._speak_with_gtts, args=(text,)).start()
-        else:
+        if not self.piper_voice and self.tts_engine.lower() != "gtts":
             logger.warning(f"Unsupported TTS engine: {self.tts_engine}. Using gTTS as fallback.")
-            threading.Thread(target=self._speak_with_gtts, args=(text,)).start()
+        
+        self.queue_speech(text)
+    
+    def queue_speech(self, text):
+        """
+        Queue text to be spoken after any previously queued speech.
+        
+        Synthesis runs on its own worker, so the next chunk is synthesized
+        while the previous one is still playing.
+        
+        Args:
+            text (str): Text to speak
+            
+        Returns:
+            concurrent.futures.Future: Completes when playback has finished
+        """
+        if not text:
+            return None
+        
+        # Piper synthesizes while it plays, so it only needs the playback stage
+        if self.piper_voice:
+            synth_future = None
+            play_future = self._playback_executor.submit(self._speak_with_piper, text, self._speech_generation)
+        else:
+            synth_future = self._synth_executor.submit(self._synthesize_with_gtts, text)
+            play_future = self._playback_executor.submit(
+                self._play_synthesized, synth_future, self._speech_generation
+            )
+        
+        self._pending_speech = [pair for pair in self._pending_speech if not pair[1].done()]
+        self._pending_speech.append((synth_future, play_future))
+        return play_future
+    
+    def stop_speaking(self):
+        """Drop queued speech and stop the speech that is currently playing."""
+        self._speech_generation += 1
+        for synth_future, play_future in self._pending_speech:
+            if play_future.cancel() and synth_future:
+                synth_future.cancel()
+                synth_future.add_done_callback(self._discard_synthesized)
+        self._pending_speech = []
+        
+        try:
+            pygame.mixer.music.stop()
+        except Exception as e:
+            logger.error(f"Error stopping speech playback: {e}")
     
-    def _speak_with_gtts(self, text):
+    def shutdown(self):
+        """Stop speech and release the speech and transcription worker threads."""
+        self.stop_speaking()
+        self.discard_recording()
+        self._stt_executor.shutdown(wait=False, cancel_futures=True)
+        self._synth_executor.shutdown(wait=False)
+        self._playback_executor.shutdown(wait=False)
+        if self._piper_stream:
+            self._piper_stream.close()
+    
+    def _speak_with_piper(self, text, generation):
         """
-        Speak text using Google Text-to-Speech.
+        Speak text with the local Piper voice, playing audio as it is synthesized.
         
         Args:
             text (str): Text to speak
+            generation (int): Value of the speech generation when queued; playback
+                stops early once stop_speaking has moved it on
         """
         try:
-            # Create a temporary file for the audio
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
+            for audio_bytes in self.piper_voice.synthesize_stream_raw(text):
+                if generation != self._speech_generation:
+                    return
+                self._piper_stream.write(np.frombuffer(audio_bytes, dtype=np.int16))
+            
+            logger.info("Text spoken successfully with Piper")
+        except Exception as e:
+            logger.error(f"Error speaking text with Piper: {e}")
+    
+    def _synthesize_with_gtts(self, text):
+        """
+        Synthesize text to an MP3 file using Google Text-to-Speech.
+        
+        Phrases already in the TTS cache are returned without calling gTTS.
+        
+        Args:
+            text (str): Text to synthesize
+            
+        Returns:
+            str: Path to the MP3 file, or None on failure
+        """
+        temp_filename = None
+        try:
+            cached_path = None
+            if self.tts_cache_size:
+                key = hashlib.blake2b(f"{self.tts_lang}|{text}".encode("utf-8"), digest_size=16).hexdigest()
+                cached_path = self.tts_cache_dir / f"{key}.mp3"
+                if cached_path.exists():
+                    # Mark as recently used for pruning
+                    os.utime(cached_path)
+                    return str(cached_path)
+            
+            # Create a temporary file for the audio, next to the cache entry if caching
+            if cached_path is None:
+                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+            else:
+                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.part', dir=self.tts_cache_dir)
+            with temp_file as fp:
                 temp_filename = fp.name
             
             # Generate speech
-            tts = gTTS(text=text, lang='en', slow=False)
+            tts = gTTS(text=text, lang=self.tts_lang, slow=False)
             tts.save(temp_filename)
             
+            if cached_path is None:
+                return temp_filename
+            
+            # Publish into the cache atomically so a partial file is never reused
+            os.replace(temp_filename, cached_path)
+            self._prune_tts_cache()
+            return str(cached_path)
+        except Exception as e:
+            logger.error(f"Error synthesizing text with gTTS: {e}")
+            
+            # Don't leave a partial file behind; pruning only sees finished entries
+            if temp_filename:
+                try:
+                    os.unlink(temp_filename)
+                except OSError:
+                    pass
+            return None
+    
+    def _play_synthesized(self, synth_future, generation):
+        """
+        Play the audio file produced by a synthesis task once it is ready.
+        
+        Args:
+            synth_future (concurrent.futures.Future): Result of _synthesize_with_gtts
+            generation (int): Value of the speech generation when queued; the
+                file is dropped unplayed once stop_speaking has moved it on
+        """
+        temp_filename = synth_future.result()
+        if not temp_filename:
+            return
+        
+        # stop_speaking may have run while this worker waited on synthesis
+        if generation != self._speech_generation:
+            self._release_speech_file(temp_filename)
+            return
+        
+        self._play_audio_file(temp_filename)
+    
+    def _discard_synthesized(self, synth_future):
+        """Delete the audio file of a synthesis task whose playback was cancelled."""
+        if synth_future.cancelled() or not synth_future.result():
+            return
+        
+        self._release_speech_file(synth_future.result())
+    
+    def _release_speech_file(self, path):
+        """
+        Delete a speech file once it is no longer needed, unless it is cached.
+        
+        Args:
+            path (str): Path to the audio file
+        """
+        if self.tts_cache_size:
+            return
+        
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.error(f"Error removing speech file: {e}")
+    
+    def _prune_tts_cache(self):
+        """Remove the least recently used phrases beyond the TTS cache size."""
+        entries = sorted(self.tts_cache_dir.glob("*.mp3"), key=lambda path: path.stat().st_mtime)
+        for path in entries[:-self.tts_cache_size]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.debug(f"Could not prune TTS cache entry {path}: {e}")
+    
+    def _play_audio_file(self, temp_filename):
+        """
+        Play an audio file, wait for it to finish and release it.
+        
+        Args:
+            temp_filename (str): Path to the audio file
+        """
+        try:
             # Play the audio
             pygame.mixer.music.load(temp_filename)
             pygame.mixer.music.play()
             
             # Wait for playback to finish
             while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
+                time.sleep(PLAYBACK_POLL_INTERVAL)
             
             # Clean up
-            os.unlink(temp_filename)
+            self._release_speech_file(temp_filename)
             
             logger.info("Text spoken successfully with gTTS")
         except Exception as e:
-            logger.error(f"Error speaking text with gTTS: {e}")
\ No newline at end of file
+            logger.error(f"Error speaking text with gTTS: {e}")
@@ -16,6 +16,7 @@ class InputManager:
         
         # Parse the shortcut key string (e.g., "ctrl+alt+a")
         self.shortcut_keys = self._parse_shortcut_key(self.shortcut_key_str)
+        # Only shortcut keys are tracked; other keys cannot affect it
         self.pressed_keys = set()
         self.listener = None
         self.is_shortcut_active = False
@@ -30,9 +31,9 @@ class InputManager:
             shortcut_str (str): Shortcut key string (e.g., "ctrl+alt+a")
             
         Returns:
-            list: List of key components
+            frozenset: Set of key components
         """
-        return shortcut_str.lower().split('+')
+        return frozenset(shortcut_str.lower().split('+'))
     
     def _key_to_string(self, key):
         """
@@ -64,15 +65,14 @@ class InputManager:
         """
         try:
             key_str = self._key_to_string(key)
+            if key_str not in self.shortcut_keys:
+                return
             
             # Add to pressed keys set
             self.pressed_keys.add(key_str)
             
-            # Check if all shortcut keys are pressed
-            shortcut_activated = all(k in self.pressed_keys for k in self.shortcut_keys)
-            
             # Only trigger the callback once when shortcut is first activated
-            if shortcut_activated and not self.is_shortcut_active:
+            if not self.is_shortcut_active and self.shortcut_keys <= self.pressed_keys:
                 self.is_shortcut_active = True
                 logger.info("Shortcut key combination pressed")
                 
@@ -91,13 +91,14 @@ class InputManager:
         """
         try:
             key_str = self._key_to_string(key)
+            if key_str not in self.shortcut_keys:
+                return
             
             # Remove from pressed keys set if present
-            if key_str in self.pressed_keys:
-                self.pressed_keys.remove(key_str)
+            self.pressed_keys.discard(key_str)
             
-            # Check if any shortcut key was released
-            if self.is_shortcut_active and key_str in self.shortcut_keys:
+            # Releasing any shortcut key ends the shortcut
+            if self.is_shortcut_active:
                 self.is_shortcut_active = False
                 logger.info("Shortcut key combination released")
                 
@@ -0,0 +1,53 @@
+import logging
+import collections
+import time
+
+logger = logging.getLogger(__name__)
+
+class QueryCache:
+    """Bounded LRU cache of answers with per-entry expiry."""
+    
+    def __init__(self, capacity=64, expire=3600):
+        self.capacity = capacity
+        self.expire = expire
+        self._entries = collections.OrderedDict()
+    
+    def get(self, key):
+        """
+        Look up a cached answer and mark it as recently used.
+        
+        Args:
+            key: Hashable key identifying the query context
+            
+        Returns:
+            str: Cached answer, or None on a miss or if the entry expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        answer, stored_at = entry
+        if self.expire and time.monotonic() - stored_at > self.expire:
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        logger.info("Returning cached response")
+        return answer
+    
+    def set(self, key, answer):
+        """
+        Store an answer, evicting the least recently used entry if full.
+        
+        Args:
+            key: Hashable key identifying the query context
+            answer (str): Answer to cache
+        """
+        self._entries[key] = (answer, time.monotonic())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all cached answers."""
+        self._entries.clear()
@@ -1,53 +1,116 @@
 import logging
+import hashlib
+import threading
 import mss
 import mss.tools
+from dataclasses import dataclass
 from PIL import Image
 import io
 
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True, slots=True)
+class Screenshot:
+    """An encoded screenshot and its content digest."""
+    
+    data: bytes
+    digest: bytes
+    mime_type: str
+    width: int
+    height: int
+
 class ScreenshotCapture:
     """Handles capturing screenshots of the active window."""
     
     def __init__(self, config_manager=None):
         self.config_manager = config_manager
-        self.format = "png"
+        self.format = "jpeg"
         self.quality = 85
+        self.png_compress_level = 1
+        self.max_dim = 1024
+        
+        # mss capture sessions are bound to the thread that opened them, so
+        # one is kept open per capturing thread
+        self._local = threading.local()
+        
+        # Reused across captures to avoid reallocating multi-MB buffers per press
+        self._frame = None
+        self._encode_buffer = io.BytesIO()
         
         if config_manager:
-            self.format = config_manager.get("screenshot", "format", "png")
-            self.quality = config_manager.get("screenshot", "quality", 85)
+            self.format = config_manager.get("screenshot", "format", default="jpeg")
+            self.quality = config_manager.get("screenshot", "quality", default=85)
+            self.png_compress_level = config_manager.get("screenshot", "png_compress_level", default=1)
+            self.max_dim = config_manager.get("screenshot", "max_dim", default=1024)
     
     def capture_active_window(self):
         """
         Capture a screenshot of the active window.
         
+        The image is encoded and hashed once here so that request building and
+        the response cache can reuse both.
+        
         Returns:
-            bytes: Image data as bytes
+            Screenshot: Encoded image data and digest, or None on failure
         """
         try:
-            with mss.mss() as sct:
-                # For the prototype, we'll just capture the main monitor
-                # In a full implementation, you'd detect the active window
-                monitor = sct.monitors[1]  # Main monitor
-                
-                # Capture the monitor
-                screenshot = sct.grab(monitor)
-                
-                # Convert to PIL Image for processing
-                img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-                
-                # Convert to bytes for API transmission
-                img_byte_arr = io.BytesIO()
+            sct = getattr(self._local, "sct", None)
+            if sct is None:
+                sct = self._local.sct = mss.mss()
+            
+            # For the prototype, we'll just capture the main monitor
+            # In a full implementation, you'd detect the active window
+            monitor = sct.monitors[1]  # Main monitor
+            
+            # Capture the monitor
+            screenshot = sct.grab(monitor)
+            
+            # Decode BGRX into the reusable RGB frame in a single pass
+            if self._frame is None or self._frame.size != screenshot.size:
+                self._frame = Image.new("RGB", screenshot.size)
+            self._frame.frombytes(screenshot.raw, "raw", "BGRX")
+            img = self._frame
+            
+            # Gemini tiles images at well under full-screen resolution, so
+            # anything larger only adds upload time; resize returns a new
+            # image and leaves the reusable frame intact
+            if self.max_dim and max(img.size) > self.max_dim:
+                scale = self.max_dim / max(img.size)
+                size = (max(round(img.width * scale), 1), max(round(img.height * scale), 1))
+                img = img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+            
+            # Convert to bytes for API transmission
+            img_byte_arr = self._encode_buffer
+            img_byte_arr.seek(0)
+            img_byte_arr.truncate(0)
+            # PNG ignores quality; a low zlib level keeps encoding fast
+            if self.format.upper() == "PNG":
+                img.save(img_byte_arr, format="PNG", compress_level=self.png_compress_level)
+            else:
                 img.save(img_byte_arr, format=self.format.upper(), quality=self.quality)
-                
-                logger.info(f"Screenshot captured: {img.width}x{img.height}")
-                return img_byte_arr.getvalue()
-                
+            
+            data = img_byte_arr.getvalue()
+            
+            logger.info(f"Screenshot captured: {img.width}x{img.height}")
+            return Screenshot(
+                data=data,
+                digest=hashlib.blake2b(data, digest_size=16).digest(),
+                mime_type=Image.MIME.get(self.format.upper(), "image/jpeg"),
+                width=img.width,
+                height=img.height
+            )
+            
         except Exception as e:
             logger.error(f"Error capturing screenshot: {e}")
             return None
     
+    def close(self):
+        """Close the capture session opened by the calling thread."""
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+    
     def save_screenshot(self, path):
         """
         Capture a screenshot and save it to disk.
@@ -59,10 +122,10 @@ class ScreenshotCapture:
             bool: True if successful, False otherwise
         """
         try:
-            screenshot_data = self.capture_active_window()
-            if screenshot_data:
+            screenshot = self.capture_active_window()
+            if screenshot:
                 with open(path, 'wb') as f:
-                    f.write(screenshot_data)
+                    f.write(screenshot.data)
                 logger.info(f"Screenshot saved to {path}")
                 return True
             return False
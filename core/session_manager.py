@@ -1,20 +1,45 @@
 import logging
 import os
-import datetime
+import time
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Markers that delimit each interaction in the session markdown; the question
+# marker includes the opening of the timestamp so headings inside answers
+# (e.g. "## Questions to ask") are not mistaken for interactions
+QUESTION_MARKER = "\n\n## Question ("
+ANSWER_MARKER = "\n\n## Answer\n\n"
+
+# Upper bound on the bytes an interaction's markers and timestamp add to the file
+TURN_OVERHEAD_BYTES = 64
+
 class SessionManager:
     """Handles conversation session management, reading and writing to markdown files."""
     
     def __init__(self, config_manager):
         self.config_manager = config_manager
-        self.sessions_dir = config_manager.get("session", "sessions_directory", "sessions")
+        self.sessions_dir = config_manager.get("session", "sessions_directory", default="sessions")
         self.current_session_file = self._get_session_file()
+        self.fsync = config_manager.get("session", "fsync", default=False)
+        self.history_turns = config_manager.get("session", "history_turns", default=8)
+        self.history_max_chars = config_manager.get("session", "history_max_chars", default=4000)
+        self.summarize_history = config_manager.get("session", "summarize_history", default=False)
+        
+        # Append-only descriptor for the current session file, opened on first write
+        self._fd = None
+        self._fd_path = None
+        self._needs_header = False
         
         # Ensure session directory exists
         os.makedirs(self.sessions_dir, exist_ok=True)
+        
+        # Window of recent (question, answer) pairs, replaced only when a turn is added;
+        # turns that fall out of it are kept for summarization when enabled
+        self.history_summary = ""
+        self._dropped_turns = []
+        self._recent_history = ()
+        self._update_window(self._read_session_turns())
     
     def _get_session_file(self):
         """
@@ -25,7 +50,7 @@ class SessionManager:
         """
         # Check if we need to create a new session
         if self.config_manager.get_new_session_on_startup():
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"session_{timestamp}.md"
             return os.path.join(self.sessions_dir, filename)
         
@@ -39,39 +64,125 @@ class SessionManager:
         Returns:
             str: Path to the new session file
         """
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
         filename = f"session_{timestamp}.md"
         new_session_path = os.path.join(self.sessions_dir, filename)
         
         self.current_session_file = new_session_path
+        self._recent_history = ()
+        self._dropped_turns = []
+        self.history_summary = ""
         logger.info(f"Created new session: {new_session_path}")
         
         return new_session_path
     
-    def get_conversation_history(self, max_entries=5):
+    def get_recent_history(self):
         """
-        Get the recent conversation history from the current session file.
+        Get the recent conversation turns for the current session.
+        
+        The same tuple object is returned until a new interaction is added.
+        
+        Returns:
+            tuple: (question, answer) pairs, oldest first
+        """
+        return self._recent_history
+    
+    def take_dropped_turns(self):
+        """
+        Get the turns that fell out of the history window since the last call.
+        
+        Only collected when session.summarize_history is enabled.
+        
+        Returns:
+            tuple: (question, answer) pairs, oldest first
+        """
+        dropped = tuple(self._dropped_turns)
+        self._dropped_turns = []
+        return dropped
+    
+    def _update_window(self, turns):
+        """
+        Replace the recent history window, keeping any dropped turns for summarization.
+        
+        Args:
+            turns (tuple): (question, answer) pairs, oldest first
+        """
+        window = self._window(turns)
+        if self.summarize_history:
+            self._dropped_turns.extend(turns[:len(turns) - len(window)])
+        self._recent_history = window
+    
+    def _window(self, turns):
+        """
+        Trim conversation turns to the configured history window.
+        
+        Turns are only dropped once a limit is exceeded, and then in a block
+        down to half of each limit, so the oldest turns sent to the model stay
+        the same for several interactions and the provider's prompt cache can
+        keep reusing that prefix.
         
         Args:
-            max_entries (int): Maximum number of conversation entries to include
+            turns (tuple): (question, answer) pairs, oldest first
             
         Returns:
-            str: Recent conversation history as a formatted string
+            tuple: Latest turns within the turn and character limits
         """
-        if not os.path.exists(self.current_session_file):
-            return ""
+        if not self.history_turns:
+            return ()
+        
+        total_chars = sum(len(question) + len(answer) for question, answer in turns)
+        if len(turns) <= self.history_turns and total_chars <= self.history_max_chars:
+            return turns
+        
+        # Cut back to half of each limit, always keeping the latest turn
+        turns = turns[-max(self.history_turns // 2, 1):]
+        total_chars = sum(len(question) + len(answer) for question, answer in turns)
+        while len(turns) > 1 and total_chars > self.history_max_chars // 2:
+            total_chars -= len(turns[0][0]) + len(turns[0][1])
+            turns = turns[1:]
+        return turns
+    
+    def _read_session_turns(self):
+        """
+        Parse the interactions already stored in the current session file.
+        
+        Unless older turns are needed for summarization, only the end of the
+        file that can hold the history window is read.
+        
+        Returns:
+            tuple: (question, answer) pairs, oldest first
+        """
+        tail_bytes = None
+        if not self.summarize_history:
+            # UTF-8 takes at most 4 bytes per character of the character budget
+            tail_bytes = 4 * self.history_max_chars + TURN_OVERHEAD_BYTES * self.history_turns
         
         try:
-            with open(self.current_session_file, 'r', encoding='utf-8') as file:
-                content = file.read()
+            with open(self.current_session_file, 'rb') as file:
+                size = file.seek(0, os.SEEK_END)
+                start = max(size - tail_bytes, 0) if tail_bytes else 0
+                file.seek(start)
+                content = file.read().decode('utf-8', errors='ignore')
                 
-            # In a real implementation, you'd parse the markdown more carefully
-            # For the prototype, we'll just return the whole file if it's not too large
-            return content
-            
+                # The latest interaction alone can outgrow the tail; read it all then
+                if start and QUESTION_MARKER not in content:
+                    file.seek(0)
+                    content = file.read().decode('utf-8', errors='ignore')
+        except FileNotFoundError:
+            return ()
         except Exception as e:
-            logger.error(f"Error reading conversation history: {e}")
-            return ""
+            logger.error(f"Error reading session file: {e}")
+            return ()
+        
+        # The piece before the first marker is the header or a partial interaction
+        turns = []
+        for block in content.split(QUESTION_MARKER)[1:]:
+            heading, found, answer = block.partition(ANSWER_MARKER)
+            if not found:
+                continue
+            _, _, question = heading.partition("\n\n")
+            turns.append((question, answer))
+        return tuple(turns)
     
     def add_interaction(self, question, answer):
         """
@@ -86,23 +197,71 @@ class SessionManager:
         """
         try:
             # Get the current timestamp
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
             
             # Format the interaction as markdown
             interaction = f"\n\n## Question ({timestamp})\n\n{question}\n\n## Answer\n\n{answer}"
             
-            # Create a new file if it doesn't exist
-            if not os.path.exists(self.current_session_file):
-                with open(self.current_session_file, 'w', encoding='utf-8') as file:
-                    file.write(f"# AI Assistant Session\n\nStarted: {timestamp}")
+            fd = self._get_session_fd()
+            
+            # Start a new file with the session header
+            if self._needs_header:
+                interaction = f"# AI Assistant Session\n\nStarted: {timestamp}" + interaction
+            
+            # Append the new interaction with a single write
+            self._write_all(fd, interaction.encode("utf-8"))
+            self._needs_header = False
+            if self.fsync:
+                getattr(os, "fdatasync", os.fsync)(fd)
             
-            # Append the new interaction
-            with open(self.current_session_file, 'a', encoding='utf-8') as file:
-                file.write(interaction)
+            self._update_window(self._recent_history + ((question, answer),))
             
             logger.info(f"Added new interaction to session file: {self.current_session_file}")
             return True
             
         except Exception as e:
             logger.error(f"Error adding interaction to session file: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def close(self):
+        """Close the session file descriptor if one is open."""
+        if self._fd is None:
+            return
+        
+        try:
+            os.close(self._fd)
+        except OSError as e:
+            logger.error(f"Error closing session file: {e}")
+        self._fd = None
+        self._fd_path = None
+    
+    def _get_session_fd(self):
+        """
+        Get an append-only file descriptor for the current session file.
+        
+        Returns:
+            int: File descriptor, reopened if the session file has changed
+        """
+        if self._fd is not None and self._fd_path == self.current_session_file:
+            return self._fd
+        
+        self.close()
+        self._fd = os.open(self.current_session_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._fd_path = self.current_session_file
+        
+        # The header is only needed once per file, so check its size only on open
+        self._needs_header = os.fstat(self._fd).st_size == 0
+        return self._fd
+    
+    def _write_all(self, fd, data):
+        """
+        Write all bytes to a file descriptor, retrying on partial writes.
+        
+        Args:
+            fd (int): File descriptor to write to
+            data (bytes): Data to write
+        """
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]